@@ -0,0 +1,171 @@
+"""Тесты декоратора логирования операций."""
+
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.decorators import log_action
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class _ListHandler(logging.Handler):
+    """Обработчик, собирающий текст записей в список."""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append((record.levelname, record.getMessage()))
+
+
+class LogActionTest(unittest.TestCase):
+    """Строки лога для разных сигнатур и исходов вызова."""
+
+    def setUp(self):
+        self.logger = logging.getLogger('valutatrade_hub.decorators')
+        self.handler = _ListHandler()
+        self.old_level = self.logger.level
+        self.old_propagate = self.logger.propagate
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.setLevel(self.old_level)
+        self.logger.propagate = self.old_propagate
+
+    def test_positional_call_with_result_slots(self):
+        @log_action('BUY')
+        def buy(user_id, currency_code, amount):
+            return {'rate': 50000, 'base': 'USD'}
+
+        self.assertEqual(buy(1, 'BTC', 0.5), {'rate': 50000, 'base': 'USD'})
+        self.assertEqual(self.handler.lines, [
+            ('INFO', "BUY result='OK' user=1 currency='BTC' amount=0.5000 rate=50000.00 base='USD'"),
+        ])
+
+    def test_keyword_call_and_defaults(self):
+        @log_action('SELL')
+        def sell(user_id, currency_code='USD', amount=1.0):
+            return None
+
+        sell(amount=2, user_id=3)
+        self.assertEqual(self.handler.lines, [
+            ('INFO', "SELL result='OK' user=3 currency='USD' amount=2.0000"),
+        ])
+
+    def test_keyword_only_and_var_arguments(self):
+        @log_action()
+        def transfer(*args, from_currency, to_currency='EUR', **kwargs):
+            return {'base': 'USD'}
+
+        transfer(1, 2, from_currency='USD', extra=True)
+        self.assertEqual(self.handler.lines, [
+            ('INFO', "TRANSFER result='OK' from='USD' to='EUR' base='USD'"),
+        ])
+
+    def test_preformatted_string_is_logged_as_is(self):
+        @log_action('BUY')
+        def buy(amount):
+            return {'rate': '1.5'}
+
+        buy('7')
+        self.assertEqual(self.handler.lines, [('INFO', "BUY result='OK' amount=7 rate=1.5")])
+
+    def test_percent_in_operation_name(self):
+        @log_action('FEE%')
+        def fee(user_id):
+            return None
+
+        fee(5)
+        self.assertEqual(self.handler.lines, [('INFO', "FEE% result='OK' user=5")])
+
+    def test_error_is_logged_and_reraised(self):
+        @log_action('SELL')
+        def sell(user_id, amount):
+            raise ValueError('нет средств')
+
+        with self.assertRaises(ValueError):
+            sell(1, 3)
+        self.assertEqual(self.handler.lines, [
+            ('ERROR', "SELL result='ERROR' user=1 amount=3.0000 "
+                      "error_type='ValueError' error_message='нет средств'"),
+        ])
+
+    def test_missing_argument_is_logged_as_error(self):
+        @log_action('BUY')
+        def buy(user_id, currency_code, amount):
+            return None
+
+        with self.assertRaises(TypeError):
+            buy(1, amount=2)
+        level, message = self.handler.lines[0]
+        self.assertEqual(level, 'ERROR')
+        self.assertTrue(message.startswith("BUY result='ERROR' user=1 amount=2.0000 error_type='TypeError'"))
+
+    def test_unexpected_argument_is_logged_as_error(self):
+        @log_action('LOGIN')
+        def login(username):
+            return None
+
+        with self.assertRaises(TypeError):
+            login('bob', password='x')
+        self.assertEqual(self.handler.lines[0][0], 'ERROR')
+        self.assertIn("user='bob'", self.handler.lines[0][1])
+
+    def test_wrapper_metadata(self):
+        @log_action('BUY')
+        def buy(user_id):
+            """Документация."""
+
+        self.assertEqual(buy.__name__, 'buy')
+        self.assertEqual(buy.__doc__, 'Документация.')
+        self.assertIn('test_wrapper_metadata', buy.__qualname__)
+
+    def test_method(self):
+        class Service:
+            @log_action('REGISTER')
+            def register(self, username):
+                return {'base': 'USD'}
+
+        Service().register('bob')
+        self.assertEqual(self.handler.lines, [('INFO', "REGISTER result='OK' user='bob' base='USD'")])
+
+    def test_info_disabled(self):
+        self.logger.setLevel(logging.ERROR)
+
+        @log_action('BUY')
+        def buy(amount):
+            return {'rate': 1}
+
+        buy(1)
+        self.assertEqual(self.handler.lines, [])
+
+
+class ImportSideEffectsTest(unittest.TestCase):
+    """Импорт модулей не настраивает логирование."""
+
+    def test_import_does_not_configure_logging(self):
+        code = (
+            'import os, threading\n'
+            'import valutatrade_hub.core.usecases\n'
+            'from valutatrade_hub import decorators\n'
+            'print(os.path.exists("logs"), threading.active_count(), decorators._configured)\n'
+        )
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=str(ROOT))
+            result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env,
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout.split(), ['False', '1', 'False'])
+
+
+if __name__ == '__main__':
+    unittest.main()
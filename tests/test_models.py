@@ -0,0 +1,210 @@
+"""Тесты моделей: хэширование паролей, курсы валют, пакетная выгрузка."""
+
+import hashlib
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from valutatrade_hub.core import models
+from valutatrade_hub.core.models import Portfolio, User, migrate_rates
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _legacy_user(password: str, salt: str = 'legacy-salt') -> User:
+    """Пользователь, загруженный из записи со старым хэшем sha256(пароль + соль)."""
+    hashed = hashlib.sha256((password + salt).encode('utf-8')).hexdigest()
+    return User(1, 'alice', None, salt=salt, hashed_password=hashed)
+
+
+class PasswordMigrationTest(unittest.TestCase):
+    """Перехэширование паролей при входе."""
+
+    def test_legacy_sha256_migrates_to_scrypt(self):
+        user = _legacy_user('secret')
+        self.assertTrue(user.needs_rehash)
+
+        self.assertTrue(user.verify_password('secret'))
+        self.assertTrue(user.hashed_password.startswith('$scrypt$'))
+        self.assertFalse(user.needs_rehash)
+        self.assertNotIn('salt', user.to_dict())
+
+        # Новый хэш проверяется без старой соли
+        restored = User.from_dict(user.to_dict())
+        self.assertTrue(restored.verify_password('secret'))
+        self.assertFalse(restored.verify_password('wrong'))
+
+    def test_legacy_wrong_password_keeps_hash(self):
+        user = _legacy_user('secret')
+        hashed = user.hashed_password
+        self.assertFalse(user.verify_password('wrong'))
+        self.assertEqual(user.hashed_password, hashed)
+
+    def test_weak_scrypt_parameters_are_upgraded(self):
+        hashed = models._scrypt_hash('secret', n=2 ** 4)
+        user = User(1, 'alice', None, hashed_password=hashed)
+        self.assertTrue(user.needs_rehash)
+
+        self.assertTrue(user.verify_password('secret'))
+        n, r, p, _ = models._scrypt_params(user.hashed_password)
+        self.assertEqual((n, r, p), (models._SCRYPT_N, models._SCRYPT_R, models._SCRYPT_P))
+
+    def test_scrypt_is_not_downgraded_to_blake2b(self):
+        hashed = models._scrypt_hash('secret')
+        user = User(1, 'alice', None, hashed_password=hashed)
+        with mock.patch.object(models, 'PASSWORD_HASH_SCHEME', 'blake2b'):
+            self.assertFalse(user.needs_rehash)
+            self.assertTrue(user.verify_password('secret'))
+        self.assertEqual(user.hashed_password, hashed)
+
+    def test_blake2b_scheme(self):
+        with mock.patch.object(models, 'PASSWORD_HASH_SCHEME', 'blake2b'):
+            user = User(1, 'alice', 'secret')
+            self.assertTrue(user.hashed_password.startswith('$blake2b$'))
+            self.assertFalse(user.needs_rehash)
+            self.assertTrue(user.verify_password('secret'))
+
+            legacy = _legacy_user('secret')
+            self.assertTrue(legacy.verify_password('secret'))
+            self.assertTrue(legacy.hashed_password.startswith('$blake2b$'))
+
+        # При выборе scrypt быстрый blake2b-хэш переводится в scrypt
+        self.assertTrue(user.needs_rehash)
+        self.assertTrue(user.verify_password('secret'))
+        self.assertTrue(user.hashed_password.startswith('$scrypt$'))
+
+
+class PasswordSchemeSettingTest(unittest.TestCase):
+    """Проверка переменной окружения VT_PASSWORD_HASH при импорте."""
+
+    def _import_models(self, scheme: str) -> subprocess.CompletedProcess:
+        env = dict(os.environ, VT_PASSWORD_HASH=scheme)
+        return subprocess.run(
+            [sys.executable, '-c',
+             'from valutatrade_hub.core import models; print(models.PASSWORD_HASH_SCHEME)'],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+
+    def test_known_scheme(self):
+        result = self._import_models('blake2b')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'blake2b')
+
+    def test_unknown_scheme_fails_at_import(self):
+        result = self._import_models('md5')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ValueError', result.stderr)
+        self.assertIn('VT_PASSWORD_HASH', result.stderr)
+
+
+class RatesTest(unittest.TestCase):
+    """Перевод курсов в ключи-кортежи и поиск курса пары."""
+
+    def test_migrate_rates_formats(self):
+        rates = {
+            'eur_usd': {'rate': 1.08, 'updated_at': '2025-01-15T10:30:00'},
+            'BTC_USD': 50000,
+            ('ETH', 'USD'): 3000.0,
+            'source': 'ParserService',
+            'last_refresh': '2025-01-15T10:35:00',
+        }
+        self.assertEqual(migrate_rates(rates), {
+            ('EUR', 'USD'): 1.08,
+            ('BTC', 'USD'): 50000.0,
+            ('ETH', 'USD'): 3000.0,
+        })
+
+    def test_build_rate_table(self):
+        table = models._build_rate_table({
+            ('EUR', 'USD'): 2.0,
+            ('USD', 'RUB'): 100.0,
+            ('BTC', 'USD'): 50000.0,
+        })
+        # Прямой и обратный курсы
+        self.assertEqual(table[('EUR', 'USD')], 2.0)
+        self.assertEqual(table[('USD', 'EUR')], 0.5)
+        # Через USD
+        self.assertEqual(table[('EUR', 'RUB')], 200.0)
+        self.assertEqual(table[('BTC', 'EUR')], 25000.0)
+        self.assertNotIn(('EUR', 'EUR'), table)
+
+    def test_direct_rate_wins_over_reverse_and_bridge(self):
+        table = models._build_rate_table({
+            ('EUR', 'USD'): 2.0,
+            ('USD', 'EUR'): 0.4,
+            ('USD', 'RUB'): 100.0,
+            ('EUR', 'RUB'): 150.0,
+        })
+        self.assertEqual(table[('USD', 'EUR')], 0.4)
+        self.assertEqual(table[('EUR', 'RUB')], 150.0)
+
+    def test_resolve_rate(self):
+        table = models._build_rate_table({('EUR', 'USD'): 2.0})
+        self.assertEqual(models._resolve_rate('GBP', 'GBP', table), 1.0)
+        self.assertEqual(models._resolve_rate('USD', 'EUR', table), 0.5)
+        self.assertIsNone(models._resolve_rate('GBP', 'USD', table))
+
+    def test_missing_rate_is_consistent(self):
+        portfolio = Portfolio(1)
+        portfolio.add_currency('USD', 10)
+        portfolio.add_currency('GBP', 5)
+        rates = {('EUR', 'USD'): 2.0}
+
+        lines, total = portfolio.render_and_value('USD', rates)
+        self.assertEqual(lines, ['- GBP: 5.0000 → курс не найден', '- USD: 10.00 → 10.00 USD'])
+        self.assertEqual(total, 10.0)
+        self.assertEqual(portfolio.get_total_value('USD', rates), 10.0)
+        self.assertIsNone(portfolio._get_exchange_rate('GBP', 'USD', rates))
+
+    def test_rates_are_read_on_every_call(self):
+        portfolio = Portfolio(1)
+        portfolio.add_currency('BTC', 2)
+        rates = {('BTC', 'USD'): 100.0}
+        self.assertEqual(portfolio.get_total_value('USD', rates), 200.0)
+        rates[('BTC', 'USD')] = 150.0
+        self.assertEqual(portfolio.get_total_value('USD', rates), 300.0)
+
+    def test_legacy_string_keys_are_accepted(self):
+        portfolio = Portfolio(1)
+        portfolio.add_currency('BTC', 2)
+        self.assertEqual(portfolio.get_total_value('USD', {'BTC_USD': {'rate': 100.0}}), 200.0)
+
+    def test_value_all_portfolios(self):
+        first = Portfolio(1)
+        first.add_currency('BTC', 1)
+        first.add_currency('USD', 10)
+        second = Portfolio(2)
+        second.add_currency('EUR', 4)
+        second.add_currency('GBP', 1)
+
+        totals = models.value_all_portfolios([first, second], {('BTC', 'USD'): 100.0, ('EUR', 'USD'): 2.0})
+        self.assertEqual(totals, {1: 110.0, 2: 8.0})
+
+
+class ExportBatchTest(unittest.TestCase):
+    """Пакетная выгрузка балансов."""
+
+    def test_export_batch(self):
+        first = Portfolio(7)
+        first.add_currency('USD', 10)
+        first.add_currency('BTC', 0.5)
+        second = Portfolio(9)
+        second.add_currency('EUR', 3)
+
+        balances, user_ids = Portfolio.export_batch([first, second], ['usd', 'EUR', 'BTC'])
+        self.assertEqual(balances.typecode, 'd')
+        self.assertEqual(balances.tolist(), [10.0, 0.0, 0.5, 0.0, 3.0, 0.0])
+        self.assertEqual(user_ids, [7, 9])
+        self.assertEqual(len(balances.tobytes()), 6 * balances.itemsize)
+
+    def test_export_batch_empty(self):
+        balances, user_ids = Portfolio.export_batch([], ['USD'])
+        self.assertEqual(len(balances), 0)
+        self.assertEqual(user_ids, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
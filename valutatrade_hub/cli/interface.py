@@ -8,8 +8,9 @@ from ..core.currencies import CurrencyNotFoundError, get_all_currencies
 from ..core.exceptions import InsufficientFundsError
 
 # Импорты из нашей системы
-from ..core.models import Portfolio, User
+from ..core.models import Portfolio, User, migrate_rates
 from ..core.usecases import usecases
+from ..decorators import configure_logging
 
 
 class CLIState:
@@ -33,8 +34,10 @@ def load_users(data_dir: Path) -> list:
 def save_users(data_dir: Path, users: list) -> None:
     """Сохранение пользователей в JSON."""
     users_file = data_dir / "users.json"
+    # Сериализуем целиком и пишем одним вызовом write()
+    data = json.dumps(users, ensure_ascii=False, indent=2)
     with open(users_file, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+        f.write(data)
 
 
 def load_portfolios(data_dir: Path) -> list:
@@ -49,8 +52,10 @@ def load_portfolios(data_dir: Path) -> list:
 def save_portfolios(data_dir: Path, portfolios: list) -> None:
     """Сохранение портфелей в JSON."""
     portfolios_file = data_dir / "portfolios.json"
+    # Сериализуем целиком и пишем одним вызовом write()
+    data = json.dumps(portfolios, ensure_ascii=False, indent=2)
     with open(portfolios_file, 'w', encoding='utf-8') as f:
-        json.dump(portfolios, f, ensure_ascii=False, indent=2)
+        f.write(data)
 
 
 def load_rates(data_dir: Path) -> dict:
@@ -200,7 +205,12 @@ def login_command(args: Dict[str, Any], state: CLIState):
         if not user.verify_password(password):
             print("Неверный пароль")
             return
-        
+
+        # Сохранение пароля, перехэшированного из устаревшего формата
+        if user.hashed_password != user_data['hashed_password']:
+            users[users.index(user_data)] = user.to_dict()
+            save_users(state.data_dir, users)
+
         # Установка текущего пользователя
         state.current_user = user
         print(f"Вы вошли как '{username}'")
@@ -246,32 +256,14 @@ def show_portfolio_command(args: Dict[str, Any], state: CLIState):
         
         print(f"Портфель пользователя '{state.current_user.username}' (база: {base}):")
         
-        total_value = 0
-        exchange_rates = {}
-        
-        # Преобразование курсов в удобный формат
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
-        
-        for currency_code, wallet in portfolio.wallets.items():
-            balance = wallet.balance
-            
-            if currency_code == base:
-                value_in_base = balance
-                print(f"- {currency_code}: {balance:.2f} → {value_in_base:.2f} {base}")
-                total_value += value_in_base
-            else:
-                # Поиск курса
-                rate_key = f"{currency_code}_{base}"
-                if rate_key in exchange_rates:
-                    rate = exchange_rates[rate_key]
-                    value_in_base = balance * rate
-                    print(f"- {currency_code}: {balance:.4f} → {value_in_base:.2f} {base}")
-                    total_value += value_in_base
-                else:
-                    print(f"- {currency_code}: {balance:.4f} → курс не найден")
-        
+        # Преобразование курсов в удобный формат: {(из, в): курс}
+        exchange_rates = migrate_rates(rates)
+
+        # Строки и итог считаются за один проход по кошелькам
+        info_lines, total_value = portfolio.render_and_value(base, exchange_rates)
+        for line in info_lines:
+            print(line)
+
         print("-" * 40)
         print(f"ИТОГО: {total_value:,.2f} {base}")
         
@@ -322,16 +314,11 @@ def buy_command(args: Dict[str, Any], state: CLIState):
         # Получение или создание кошелька
         wallet = portfolio.get_or_create_wallet(currency)
         
-        # Загрузка курсов для оценочной стоимости
-        rates = load_rates(state.data_dir)
-        exchange_rates = {}
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
+        # Загрузка курсов для оценочной стоимости: {(из, в): курс}
+        exchange_rates = migrate_rates(load_rates(state.data_dir))
         
         # Расчет оценочной стоимости
-        rate_key = f"{currency}_USD"
-        rate = exchange_rates.get(rate_key, 0)
+        rate = exchange_rates.get((currency, 'USD'), 0)
         estimated_cost = amount * rate if rate > 0 else 0
         
         # Пополнение кошелька
@@ -413,16 +400,11 @@ def sell_command(args: Dict[str, Any], state: CLIState):
             print(f"У вас нет кошелька '{currency}'. Добавьте валюту: она создаётся автоматически при первой покупке.")
             return
         
-        # Загрузка курсов для оценочной выручки
-        rates = load_rates(state.data_dir)
-        exchange_rates = {}
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
+        # Загрузка курсов для оценочной выручки: {(из, в): курс}
+        exchange_rates = migrate_rates(load_rates(state.data_dir))
         
         # Расчет оценочной выручки
-        rate_key = f"{currency}_USD"
-        rate = exchange_rates.get(rate_key, 0)
+        rate = exchange_rates.get((currency, 'USD'), 0)
         estimated_revenue = amount * rate if rate > 0 else 0
         
         # Снятие средств
@@ -606,6 +588,8 @@ def interactive_mode():
 
 def main():
     """Основная функция CLI."""
+    configure_logging()
+    
     # Если нет аргументов - запускаем интерактивный режим
     if len(sys.argv) == 1:
         interactive_mode()
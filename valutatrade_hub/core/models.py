@@ -1,12 +1,172 @@
 import hashlib
+import hmac
+import math
+import os
 import secrets
+import sys
+from array import array
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .exceptions import InsufficientFundsError
+
+# Параметры scrypt: ~16 МБ памяти и ~50 мс на одну проверку пароля
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SCRYPT_PREFIX = '$scrypt$'
+_BLAKE2B_PREFIX = '$blake2b$'
+
+# Схема хэширования новых паролей:
+#   'scrypt'  - медленный memory-hard KDF (по умолчанию, устойчив к перебору)
+#   'blake2b' - быстрый ключевой BLAKE2b (только если политика безопасности
+#               допускает быструю проверку ценой стойкости к перебору)
+# При следующем успешном входе перехэшируются устаревшие SHA-256 хэши,
+# blake2b-хэши (если выбран scrypt) и scrypt-хэши с параметрами слабее
+# текущих; scrypt никогда не заменяется на более быстрый blake2b.
+PASSWORD_HASH_SCHEME = os.environ.get('VT_PASSWORD_HASH', 'scrypt')
+
+# Нормализованные и интернированные коды валют: исходная строка -> код.
+# Размер ограничен: ключи - ввод пользователя, и произвольные строки
+# не должны оставаться в памяти навсегда
+_CODE_CACHE: Dict[str, str] = {}
+_CODE_CACHE_MAX = 256
+
+
+def _norm(code: str) -> str:
+    """
+    Нормализация кода валюты (верхний регистр, без пробелов).
+    
+    Коды валют - небольшое закрытое множество, поэтому результат
+    интернируется и кэшируется по исходной строке (пока кэш не заполнен).
+    
+    Args:
+        code: Код валюты в произвольном виде
+        
+    Returns:
+        Интернированный код валюты
+    """
+    normalized = _CODE_CACHE.get(code)
+    if normalized is None:
+        normalized = code.strip().upper()
+        if len(_CODE_CACHE) < _CODE_CACHE_MAX:
+            normalized = sys.intern(normalized)
+            _CODE_CACHE[code] = normalized
+    return normalized
+
+
+def _scrypt_hash(password: str, n: int = _SCRYPT_N, r: int = _SCRYPT_R,
+                 p: int = _SCRYPT_P, salt: bytes = None) -> str:
+    """
+    Хэширование пароля через scrypt.
+    
+    Args:
+        password: Пароль для хэширования
+        n, r, p: Параметры стоимости scrypt
+        salt: Соль (генерируется автоматически)
+        
+    Returns:
+        Строка вида '$scrypt$n=16384,r=8,p=1$<соль>$<хэш>'
+    """
+    if salt is None:
+        salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"{_SCRYPT_PREFIX}n={n},r={r},p={p}${salt.hex()}${digest.hex()}"
+
+
+def _scrypt_params(hashed_password: str) -> Tuple[int, int, int, bytes]:
+    """
+    Разбор строки, полученной из _scrypt_hash.
+    
+    Args:
+        hashed_password: Сохранённый хэш со встроенными параметрами и солью
+        
+    Returns:
+        Параметры стоимости (n, r, p) и соль
+        
+    Raises:
+        KeyError, ValueError: Если строка повреждена
+    """
+    params, salt_hex, _ = hashed_password[len(_SCRYPT_PREFIX):].split('$')
+    cost = dict(item.split('=') for item in params.split(','))
+    return int(cost['n']), int(cost['r']), int(cost['p']), bytes.fromhex(salt_hex)
+
+
+def _scrypt_verify(hashed_password: str, password: str) -> bool:
+    """
+    Проверка пароля по строке, полученной из _scrypt_hash.
+    
+    Args:
+        hashed_password: Сохранённый хэш со встроенными параметрами и солью
+        password: Пароль для проверки
+        
+    Returns:
+        True если пароль верный, иначе False
+    """
+    try:
+        n, r, p, salt = _scrypt_params(hashed_password)
+        expected = _scrypt_hash(password, n=n, r=r, p=p, salt=salt)
+    except (KeyError, ValueError):
+        return False
+    return hmac.compare_digest(hashed_password, expected)
+
+
+def _blake2b_hash(password: str, salt: bytes = None) -> str:
+    """
+    Хэширование пароля ключевым BLAKE2b (соль используется как ключ).
+    
+    Args:
+        password: Пароль для хэширования
+        salt: Соль (генерируется автоматически)
+        
+    Returns:
+        Строка вида '$blake2b$<соль>$<хэш>'
+    """
+    if salt is None:
+        salt = secrets.token_bytes(16)
+    digest = hashlib.blake2b(password.encode('utf-8'), key=salt, digest_size=32)
+    return f"{_BLAKE2B_PREFIX}{salt.hex()}${digest.hexdigest()}"
+
+
+def _blake2b_verify(hashed_password: str, password: str) -> bool:
+    """
+    Проверка пароля по строке, полученной из _blake2b_hash.
+    
+    Args:
+        hashed_password: Сохранённый хэш со встроенной солью
+        password: Пароль для проверки
+        
+    Returns:
+        True если пароль верный, иначе False
+    """
+    try:
+        salt_hex, _ = hashed_password[len(_BLAKE2B_PREFIX):].split('$')
+        expected = _blake2b_hash(password, salt=bytes.fromhex(salt_hex))
+    except ValueError:
+        return False
+    return hmac.compare_digest(hashed_password, expected)
+
+
+# Схема -> (префикс хэша, функция хэширования, функция проверки)
+_PASSWORD_HASHERS = {
+    'scrypt': (_SCRYPT_PREFIX, _scrypt_hash, _scrypt_verify),
+    'blake2b': (_BLAKE2B_PREFIX, _blake2b_hash, _blake2b_verify),
+}
+
+if PASSWORD_HASH_SCHEME not in _PASSWORD_HASHERS:
+    raise ValueError(
+        f"Неизвестная схема хэширования паролей VT_PASSWORD_HASH={PASSWORD_HASH_SCHEME!r}; "
+        f"допустимые значения: {', '.join(_PASSWORD_HASHERS)}"
+    )
 
 
 class User:
     """Класс пользователя системы с аутентификацией и валидацией."""
     
+    __slots__ = ('_user_id', '_username', '_registration_date', '_registration_iso',
+                 '_registration_day', '_legacy_salt', '_hashed_password')
+    
     def __init__(self, user_id: int, username: str, password: str, 
                  registration_date: datetime = None, salt: str = None, 
                  hashed_password: str = None):
@@ -18,21 +178,17 @@ class User:
             username: Имя пользователя
             password: Пароль (если hashed_password не указан)
             registration_date: Дата регистрации (по умолчанию текущее время)
-            salt: Соль для хеширования (генерируется автоматически)
+            salt: Соль устаревшего SHA-256 хэша (только для загрузки старых записей)
             hashed_password: Уже захэшированный пароль (для загрузки из БД)
         """
         self._user_id = user_id
         self._username = username
         
         if registration_date is None:
-            self._registration_date = datetime.now()
-        else:
-            self._registration_date = registration_date
+            registration_date = datetime.now()
+        self._set_registration_date(registration_date)
             
-        if salt is None:
-            self._salt = secrets.token_hex(8)
-        else:
-            self._salt = salt
+        self._legacy_salt = salt
             
         if hashed_password is not None:
             self._hashed_password = hashed_password
@@ -69,9 +225,36 @@ class User:
         return self._hashed_password
     
     @property
-    def salt(self) -> str:
-        """Геттер для соли."""
-        return self._salt
+    def needs_rehash(self) -> bool:
+        """Сохранённый хэш слабее текущей политики и будет обновлён при входе."""
+        return self._rehash_scheme() is not None
+    
+    def _rehash_scheme(self) -> Optional[str]:
+        """
+        Схема, в которую перехэшируется сохранённый пароль при входе.
+        
+        Устаревший SHA-256 переводится в схему PASSWORD_HASH_SCHEME,
+        blake2b - в scrypt, если выбрана она. scrypt не заменяется более
+        быстрой схемой: он обновляется, только если его параметры
+        слабее текущих.
+        
+        Returns:
+            Имя схемы или None, если перехэширование не нужно
+        """
+        hashed = self._hashed_password
+        if hashed.startswith(_SCRYPT_PREFIX):
+            try:
+                n, r, p, _ = _scrypt_params(hashed)
+            except (KeyError, ValueError):
+                return None
+            outdated = (
+                (n, r, p) != (_SCRYPT_N, _SCRYPT_R, _SCRYPT_P)
+                and n <= _SCRYPT_N and r <= _SCRYPT_R and p <= _SCRYPT_P
+            )
+            return 'scrypt' if outdated else None
+        if hashed.startswith(_BLAKE2B_PREFIX):
+            return 'scrypt' if PASSWORD_HASH_SCHEME == 'scrypt' else None
+        return PASSWORD_HASH_SCHEME
     
     @property
     def registration_date(self) -> datetime:
@@ -83,11 +266,18 @@ class User:
         """Сеттер для даты регистрации."""
         if not isinstance(value, datetime):
             raise ValueError("Дата регистрации должна быть объектом datetime")
+        self._set_registration_date(value)
+    
+    def _set_registration_date(self, value: datetime) -> None:
+        """Установка даты регистрации вместе с её строковыми представлениями."""
         self._registration_date = value
+        # Дата неизменна между записями, поэтому форматируем её один раз
+        self._registration_iso = value.isoformat()
+        self._registration_day = value.strftime('%Y-%m-%d')
     
     def _hash_password(self, password: str) -> str:
         """
-        Хэширование пароля с солью.
+        Хэширование пароля схемой PASSWORD_HASH_SCHEME (соль встроена в результат).
         
         Args:
             password: Пароль для хэширования
@@ -98,24 +288,54 @@ class User:
         if len(password) < 4:
             raise ValueError("Пароль должен быть не короче 4 символов")
         
-        password_bytes = password.encode('utf-8')
-        salt_bytes = self._salt.encode('utf-8')
-        return hashlib.sha256(password_bytes + salt_bytes).hexdigest()
+        return _PASSWORD_HASHERS[PASSWORD_HASH_SCHEME][1](password)
+    
+    def _legacy_hash_password(self, password: str) -> str:
+        """
+        Хэширование пароля устаревшей схемой sha256(пароль + соль).
+        
+        Args:
+            password: Пароль для хэширования
+            
+        Returns:
+            Хэшированный пароль
+        """
+        # Соль подаётся отдельным update(), без склейки в промежуточный буфер
+        ctx = hashlib.sha256(password.encode('utf-8'))
+        ctx.update(self._legacy_salt.encode('utf-8'))
+        return ctx.hexdigest()
     
     def verify_password(self, password: str) -> bool:
         """
         Проверка пароля на совпадение.
         
+        Пароль в более слабом формате (см. _rehash_scheme) при успешной
+        проверке перехэшируется.
+        
         Args:
             password: Пароль для проверки
             
         Returns:
             True если пароль верный, иначе False
         """
-        try:
-            return self._hashed_password == self._hash_password(password)
-        except ValueError:
+        if len(password) < 4:
             return False
+        
+        for prefix, _, verify in _PASSWORD_HASHERS.values():
+            if self._hashed_password.startswith(prefix):
+                verified = verify(self._hashed_password, password)
+                break
+        else:
+            verified = self._legacy_salt is not None and hmac.compare_digest(
+                self._hashed_password, self._legacy_hash_password(password))
+        
+        if verified:
+            scheme = self._rehash_scheme()
+            if scheme is not None:
+                # Миграция на более стойкую схему при успешном входе
+                self._hashed_password = _PASSWORD_HASHERS[scheme][1](password)
+                self._legacy_salt = None
+        return verified
     
     def change_password(self, new_password: str) -> None:
         """
@@ -128,6 +348,7 @@ class User:
             ValueError: Если пароль слишком короткий
         """
         self._hashed_password = self._hash_password(new_password)
+        self._legacy_salt = None
     
     def get_user_info(self) -> Dict[str, Any]:
         """
@@ -139,8 +360,7 @@ class User:
         return {
             'user_id': self._user_id,
             'username': self._username,
-            'registration_date': self._registration_date.isoformat(),
-            'salt': self._salt
+            'registration_date': self._registration_iso
         }
     
 
@@ -151,13 +371,15 @@ class User:
         Returns:
             Словарь для сохранения в JSON
         """
-        return {
+        data = {
             'user_id': self._user_id,
             'username': self._username,
             'hashed_password': self._hashed_password,
-            'salt': self._salt,
-            'registration_date': self._registration_date.isoformat()
+            'registration_date': self._registration_iso
         }
+        if self._legacy_salt is not None:
+            data['salt'] = self._legacy_salt
+        return data
         
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'User':
@@ -176,21 +398,84 @@ class User:
             username=data['username'],
             password="",  # Пароль не используется при загрузке из хэша
             registration_date=registration_date,
-            salt=data['salt'],
+            salt=data.get('salt'),
             hashed_password=data['hashed_password']
         )
     
     def __str__(self) -> str:
         """Строковое представление пользователя."""
-        return f"User(id={self._user_id}, username='{self._username}', registered={self._registration_date.strftime('%Y-%m-%d')})"
+        return f"User(id={self._user_id}, username='{self._username}', registered={self._registration_day})"
     
     def __repr__(self) -> str:
         """Представление для отладки."""
         return f"User(user_id={self._user_id}, username='{self._username}')"
+
+
+# Типы, которые float() приводит к числу, но которые не считаются суммой
+_NON_NUMERIC_TYPES = (str, bytes, bytearray)
+
+# Тексты ошибок валидации сумм: (не число, не конечное число, вне диапазона)
+_BALANCE_ERRORS = (
+    "Баланс должен быть числом",
+    "Баланс должен быть конечным числом",
+    "Баланс не может быть отрицательным",
+)
+_DEPOSIT_ERRORS = (
+    "Сумма пополнения должна быть числом",
+    "Сумма пополнения должна быть конечным числом",
+    "Сумма пополнения должна быть положительной",
+)
+_WITHDRAW_ERRORS = (
+    "Сумма снятия должна быть числом",
+    "Сумма снятия должна быть конечным числом",
+    "Сумма снятия должна быть положительной",
+)
+
+
+def _to_float(value: Any, errors: Tuple[str, str, str], allow_zero: bool = False) -> float:
+    """
+    Приведение суммы к конечному неотрицательному (или положительному) float.
     
+    Args:
+        value: Исходное значение
+        errors: Тексты ошибок (не число, не конечное число, вне диапазона)
+        allow_zero: Допускается ли ноль (для баланса)
+        
+    Returns:
+        Значение в виде float
+        
+    Raises:
+        ValueError: Если значение не число, не конечное или вне диапазона
+    """
+    # float() принимает и строки ('12', 'inf'), поэтому они отсекаются явно;
+    # готовый float в приведении не нуждается
+    if type(value) is not float:
+        if isinstance(value, _NON_NUMERIC_TYPES):
+            raise ValueError(errors[0])
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(errors[0]) from None
+    if not math.isfinite(value):
+        raise ValueError(errors[1])
+    if value < 0 if allow_zero else value <= 0:
+        raise ValueError(errors[2])
+    return value
+
+
+# Шаблоны строкового представления кошелька, разобранные один раз
+_BAL_FMT = '{}: {:.4f}'.format
+_WALLET_STR_FMT = 'Wallet({}: {:.4f})'.format
+
+
 class Wallet:
     """Класс кошелька пользователя для одной конкретной валюты."""
     
+    # Баланс и код валюты - обычные атрибуты слотов без свойств:
+    # чтение на горячем пути (оценка портфеля) идёт напрямую,
+    # а валидация выполняется только при записи через методы
+    __slots__ = ('currency_code', 'balance')
+    
     def __init__(self, currency_code: str, balance: float = 0.0):
         """
         Инициализация кошелька.
@@ -198,32 +483,18 @@ class Wallet:
         Args:
             currency_code: Код валюты (например, "USD", "BTC")
             balance: Начальный баланс (по умолчанию 0.0)
+            
+        Raises:
+            ValueError: Если код валюты пустой или баланс некорректен
         """
-        self.currency_code = currency_code
-        self._balance = 0.0  # Инициализируем через сеттер для валидации
-        self.balance = balance  # Используем сеттер для установки начального баланса
-    
-    @property
-    def currency_code(self) -> str:
-        """Геттер для кода валюты."""
-        return self._currency_code
-    
-    @currency_code.setter
-    def currency_code(self, value: str) -> None:
-        """Сеттер для кода валюты."""
-        if not value or not isinstance(value, str):
+        if not currency_code or not isinstance(currency_code, str):
             raise ValueError("Код валюты не может быть пустым")
-        self._currency_code = value.upper().strip()
-    
-    @property
-    def balance(self) -> float:
-        """Геттер для баланса."""
-        return self._balance
+        self.currency_code = _norm(currency_code)
+        self.set_balance(balance)
     
-    @balance.setter
-    def balance(self, value: float) -> None:
+    def set_balance(self, value: float) -> None:
         """
-        Сеттер для баланса с валидацией.
+        Установка баланса с валидацией.
         
         Args:
             value: Новое значение баланса
@@ -231,11 +502,7 @@ class Wallet:
         Raises:
             ValueError: Если значение отрицательное или некорректного типа
         """
-        if not isinstance(value, (int, float)):
-            raise ValueError("Баланс должен быть числом")
-        if value < 0:
-            raise ValueError("Баланс не может быть отрицательным")
-        self._balance = float(value)
+        self.balance = _to_float(value, _BALANCE_ERRORS, allow_zero=True)
     
     def deposit(self, amount: float) -> None:
         """
@@ -247,12 +514,7 @@ class Wallet:
         Raises:
             ValueError: Если сумма не положительная
         """
-        if not isinstance(amount, (int, float)):
-            raise ValueError("Сумма пополнения должна быть числом")
-        if amount <= 0:
-            raise ValueError("Сумма пополнения должна быть положительной")
-        
-        self.balance += amount
+        self.balance += _to_float(amount, _DEPOSIT_ERRORS)
     
     def withdraw(self, amount: float) -> None:
         """
@@ -265,14 +527,10 @@ class Wallet:
             ValueError: Если сумма не положительная
             InsufficientFundsError: Если недостаточно средств
         """
-        if not isinstance(amount, (int, float)):
-            raise ValueError("Сумма снятия должна быть числом")
-        if amount <= 0:
-            raise ValueError("Сумма снятия должна быть положительной")
-        
-        if amount > self._balance:
+        amount = _to_float(amount, _WITHDRAW_ERRORS)
+        if amount > self.balance:
             raise InsufficientFundsError(
-                available=self._balance,
+                available=self.balance,
                 required=amount,
                 currency_code=self.currency_code
             )
@@ -286,7 +544,7 @@ class Wallet:
         Returns:
             Строка с информацией о балансе
         """
-        return f"{self.currency_code}: {self._balance:.4f}"
+        return _BAL_FMT(self.currency_code, self.balance)
     
     
     def to_dict(self) -> dict:
@@ -298,7 +556,7 @@ class Wallet:
         """
         return {
             "currency_code": self.currency_code,
-            "balance": self._balance
+            "balance": self.balance
         }
     
     
@@ -313,22 +571,162 @@ class Wallet:
         Returns:
             Объект Wallet
         """
-        return cls(
-            currency_code=data["currency_code"],
-            balance=data["balance"]
-        )
+        return cls._unchecked(data["currency_code"], float(data["balance"]))
+    
+    @classmethod
+    def _unchecked(cls, currency_code: str, balance: float) -> 'Wallet':
+        """
+        Создание кошелька без валидации (для доверенных данных).
+        
+        Args:
+            currency_code: Код валюты
+            balance: Баланс
+            
+        Returns:
+            Объект Wallet
+        """
+        wallet = cls.__new__(cls)
+        wallet.currency_code = _norm(currency_code)
+        wallet.balance = balance
+        return wallet
     
     def __str__(self) -> str:
         """Строковое представление кошелька."""
-        return f"Wallet({self.currency_code}: {self._balance:.4f})"
+        return _WALLET_STR_FMT(self.currency_code, self.balance)
     
     def __repr__(self) -> str:
         """Представление для отладки."""
-        return f"Wallet(currency_code='{self.currency_code}', balance={self._balance})"
+        return f"Wallet(currency_code='{self.currency_code}', balance={self.balance})"
+
+
+
+# Заглушка курсов валют (в реальном приложении брать из rates.json)
+# Общая для всех методов Portfolio и доступна только для чтения, поэтому
+# её таблица всех пар строится один раз (_DEFAULT_RATE_TABLE ниже)
+_DEFAULT_RATES: Mapping[Tuple[str, str], float] = MappingProxyType({
+    ('USD', 'USD'): 1.0,
+    ('EUR', 'USD'): 1.08,
+    ('BTC', 'USD'): 50000.0,
+    ('ETH', 'USD'): 3000.0,
+    ('RUB', 'USD'): 0.011
+})
+
+
+def migrate_rates(rates: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+    """
+    Перевод курсов с ключами вида 'EUR_USD' в словарь с ключами-кортежами.
+    
+    Принимает как плоский словарь {'EUR_USD': 1.08}, так и формат
+    rates.json ({'EUR_USD': {'rate': 1.08, ...}, 'source': ...}).
+    Служебные поля без курса пропускаются, ключи-кортежи переносятся как есть.
+    
+    Args:
+        rates: Словарь курсов со строковыми ключами
+        
+    Returns:
+        Словарь {(исходная валюта, целевая валюта): курс}
+    """
+    migrated = {}
+    for key, value in rates.items():
+        if isinstance(value, dict):
+            value = value.get('rate')
+        if not isinstance(value, (int, float)):
+            continue
+        if isinstance(key, tuple):
+            migrated[key] = float(value)
+            continue
+        from_currency, _, to_currency = key.partition('_')
+        migrated[(_norm(from_currency), _norm(to_currency))] = float(value)
+    return migrated
+
+
+def _rate_table(exchange_rates: Optional[Mapping[Tuple[str, str], float]]) -> Mapping[Tuple[str, str], float]:
+    """
+    Таблица курсов всех пар для словаря курсов.
+    
+    Таблица строится из текущего содержимого словаря при каждом вызове
+    и не кэшируется, поэтому словарь можно изменять между вызовами.
+    Готовая таблица есть только у неизменяемой заглушки _DEFAULT_RATES.
+    Словарь со строковыми ключами 'EUR_USD' (прежний формат) перед
+    построением таблицы переводится через migrate_rates.
+    
+    Args:
+        exchange_rates: Словарь курсов (None - заглушка)
+        
+    Returns:
+        Словарь {(исходная валюта, целевая валюта): курс}
+    """
+    if exchange_rates is None or exchange_rates is _DEFAULT_RATES:
+        return _DEFAULT_RATE_TABLE
+    if any(isinstance(key, str) for key in exchange_rates):
+        exchange_rates = migrate_rates(exchange_rates)
+    return _build_rate_table(exchange_rates)
+
+
+def _build_rate_table(exchange_rates: Mapping[Tuple[str, str], float]) -> Dict[Tuple[str, str], float]:
+    """
+    Построение таблицы курсов для всех пар валют.
+    
+    Для каждой пары берётся прямой курс, иначе обратный, иначе курс
+    через USD - тот же порядок, что и при поиске отдельной пары.
+    
+    Args:
+        exchange_rates: Словарь курсов {(из, в): курс}
+        
+    Returns:
+        Словарь {(исходная валюта, целевая валюта): курс}
+    """
+    table = dict(exchange_rates)
+    
+    # Обратные курсы там, где нет прямых
+    for (from_currency, to_currency), rate in exchange_rates.items():
+        if rate and (to_currency, from_currency) not in table:
+            table[(to_currency, from_currency)] = 1.0 / rate
+    
+    # Курсы через USD для оставшихся пар
+    currencies = {code for pair in table for code in pair}
+    currencies.discard('USD')
+    for from_currency in currencies:
+        source_to_usd = table.get((from_currency, 'USD'))
+        if source_to_usd is None:
+            continue
+        for to_currency in currencies:
+            if from_currency == to_currency or (from_currency, to_currency) in table:
+                continue
+            usd_to_target = table.get(('USD', to_currency))
+            if usd_to_target is not None:
+                table[(from_currency, to_currency)] = source_to_usd * usd_to_target
+    
+    return table
+
+
+# Таблица всех пар для заглушки курсов (только для чтения)
+_DEFAULT_RATE_TABLE = MappingProxyType(_build_rate_table(_DEFAULT_RATES))
+
+
+def _resolve_rate(from_currency: str, to_currency: str,
+                  rate_table: Mapping[Tuple[str, str], float]) -> Optional[float]:
+    """
+    Получение курса из таблицы всех пар.
     
+    Args:
+        from_currency: Исходная валюта
+        to_currency: Целевая валюта
+        rate_table: Таблица из _rate_table
+        
+    Returns:
+        Курс обмена или None если курс не найден
+    """
+    if from_currency == to_currency:
+        return 1.0
+    return rate_table.get((from_currency, to_currency))
+
+
 class Portfolio:
     """Класс для управления всеми кошельками одного пользователя."""
     
+    __slots__ = ('_user_id', '_wallets', '_wallets_view')
+    
     def __init__(self, user_id: int, wallets: Dict[str, 'Wallet'] = None):
         """
         Инициализация портфеля.
@@ -339,6 +737,7 @@ class Portfolio:
         """
         self._user_id = user_id
         self._wallets = wallets if wallets is not None else {}
+        self._wallets_view = MappingProxyType(self._wallets)
     
     @property
     def user_id(self) -> int:
@@ -353,8 +752,17 @@ class Portfolio:
         self._user_id = value
     
     @property
-    def wallets(self) -> Dict[str, 'Wallet']:
-        """Геттер, который возвращает копию словаря кошельков."""
+    def wallets(self) -> Mapping[str, 'Wallet']:
+        """Геттер, который возвращает представление кошельков только для чтения."""
+        return self._wallets_view
+    
+    def wallets_copy(self) -> Dict[str, 'Wallet']:
+        """
+        Возвращает снимок словаря кошельков.
+        
+        Returns:
+            Копия словаря (ключ - код валюты, значение - Wallet)
+        """
         return self._wallets.copy()
     
     @property
@@ -376,6 +784,7 @@ class Portfolio:
         Raises:
             ValueError: Если валюта уже существует в портфеле
         """
+        currency_code = _norm(currency_code)
         if currency_code in self._wallets:
             raise ValueError(f"Валюта '{currency_code}' уже существует в портфеле")
         
@@ -393,7 +802,7 @@ class Portfolio:
         Returns:
             Объект Wallet или None если не найден
         """
-        return self._wallets.get(currency_code.upper())
+        return self._wallets.get(_norm(currency_code))
     
     def get_or_create_wallet(self, currency_code: str) -> 'Wallet':
         """
@@ -405,20 +814,23 @@ class Portfolio:
         Returns:
             Существующий или новый объект Wallet
         """
-        currency_code = currency_code.upper()
+        currency_code = _norm(currency_code)
         wallet = self.get_wallet(currency_code)
         if wallet is None:
             wallet = self.add_currency(currency_code)
         return wallet
     
     def get_total_value(self, base_currency: str = 'USD', 
-                       exchange_rates: Dict[str, float] = None) -> float:
+                       exchange_rates: Dict[Tuple[str, str], float] = None) -> float:
         """
         Возвращает общую стоимость всех валют в указанной базовой валюте.
         
+        Курсы читаются из exchange_rates при каждом вызове, поэтому словарь
+        можно обновлять между вызовами (но не во время вызова).
+        
         Args:
             base_currency: Базовая валюта для конвертации
-            exchange_rates: Словарь курсов валют (если None, используется заглушка)
+            exchange_rates: Словарь курсов {(из, в): курс} (если None, используется заглушка)
             
         Returns:
             Общая стоимость в базовой валюте
@@ -426,105 +838,88 @@ class Portfolio:
         if not self._wallets:
             return 0.0
         
-        # Заглушка курсов валют (в реальном приложении брать из rates.json)
-        if exchange_rates is None:
-            exchange_rates = {
-                'USD_USD': 1.0,
-                'EUR_USD': 1.08,
-                'BTC_USD': 50000.0,
-                'ETH_USD': 3000.0,
-                'RUB_USD': 0.011
-            }
-        
+        # Отдельный проход без форматирования строк; валюты без курса пропускаются
+        rate_table = _rate_table(exchange_rates)
         total_value = 0.0
-        
         for currency_code, wallet in self._wallets.items():
-            if currency_code == base_currency:
-                # Если валюта совпадает с базовой, просто добавляем баланс
-                total_value += wallet.balance
-            else:
-                # Ищем курс для конвертации
-                rate_key = f"{currency_code}_{base_currency}"
-                reverse_rate_key = f"{base_currency}_{currency_code}"
-                
-                if rate_key in exchange_rates:
-                    # Прямой курс найден
-                    rate = exchange_rates[rate_key]
-                    total_value += wallet.balance * rate
-                elif reverse_rate_key in exchange_rates:
-                    # Обратный курс найден - инвертируем
-                    rate = 1.0 / exchange_rates[reverse_rate_key]
-                    total_value += wallet.balance * rate
-                else:
-                    # Курс не найден - пропускаем валюту
-                    print(f"Предупреждение: Курс для {currency_code}→{base_currency} не найден")
-                    continue
-        
+            rate = _resolve_rate(currency_code, base_currency, rate_table)
+            if rate is not None:
+                total_value += wallet.balance * rate
         return total_value
     
     def get_portfolio_info(self, base_currency: str = 'USD',
-                          exchange_rates: Dict[str, float] = None) -> List[str]:
+                          exchange_rates: Dict[Tuple[str, str], float] = None) -> List[str]:
         """
         Возвращает детальную информацию о портфеле.
         
+        Курсы читаются из exchange_rates при каждом вызове, поэтому словарь
+        можно обновлять между вызовами (но не во время вызова).
+        
         Args:
             base_currency: Базовая валюта для конвертации
-            exchange_rates: Словарь курсов валют
+            exchange_rates: Словарь курсов валют (если None, используется заглушка)
             
         Returns:
             Список строк с информацией о каждом кошельке
         """
+        return self.render_and_value(base_currency, exchange_rates)[0]
+    
+    def render_and_value(self, base_currency: str,
+                         exchange_rates: Optional[Dict[Tuple[str, str], float]]) -> Tuple[List[str], float]:
+        """
+        Строки с информацией о кошельках и общая стоимость за один проход.
+        
+        Курс каждой валюты ищется один раз и используется и для строки,
+        и для итоговой суммы. Валюты без курса в сумму не входят.
+        Курсы читаются из exchange_rates при каждом вызове, поэтому словарь
+        можно обновлять между вызовами (но не во время вызова).
+        
+        Args:
+            base_currency: Базовая валюта для конвертации
+            exchange_rates: Словарь курсов {(из, в): курс} (если None, используется заглушка)
+            
+        Returns:
+            Кортеж (список строк по каждому кошельку, общая стоимость)
+        """
         info_lines = []
+        total_value = 0.0
+        rate_table = _rate_table(exchange_rates)
         
         for currency_code, wallet in sorted(self._wallets.items()):
             balance = wallet.balance
+            rate = _resolve_rate(currency_code, base_currency, rate_table)
+            
+            if rate is None:
+                info_lines.append(f"- {currency_code}: {balance:.4f} → курс не найден")
+                continue
+            
+            value_in_base = balance * rate
+            total_value += value_in_base
             
             if currency_code == base_currency:
-                value_in_base = balance
                 info_lines.append(f"- {currency_code}: {balance:.2f} → {value_in_base:.2f} {base_currency}")
             else:
-                # Упрощенный расчет (в реальном приложении использовать get_total_value логику)
-                value_in_base = balance * self._get_exchange_rate(currency_code, base_currency, exchange_rates)
                 info_lines.append(f"- {currency_code}: {balance:.4f} → {value_in_base:.2f} {base_currency}")
         
-        return info_lines
+        return info_lines, total_value
     
     def _get_exchange_rate(self, from_currency: str, to_currency: str,
-                          exchange_rates: Dict[str, float] = None) -> float:
+                          exchange_rates: Dict[Tuple[str, str], float] = None) -> Optional[float]:
         """
         Вспомогательный метод для получения курса валют.
         
+        Курс ищется так же, как в render_and_value и get_total_value:
+        отсутствующий курс не подменяется заглушкой.
+        
         Args:
             from_currency: Исходная валюта
             to_currency: Целевая валюта
             exchange_rates: Словарь курсов
             
         Returns:
-            Курс обмена
-        """
-        if exchange_rates is None:
-            exchange_rates = {
-                'EUR_USD': 1.08,
-                'BTC_USD': 50000.0,
-                'ETH_USD': 3000.0,
-                'RUB_USD': 0.011
-            }
-        
-        if from_currency == to_currency:
-            return 1.0
-        
-        rate_key = f"{from_currency}_{to_currency}"
-        if rate_key in exchange_rates:
-            return exchange_rates[rate_key]
-        
-        # Если прямого курса нет, пытаемся найти через USD
-        if from_currency != 'USD' and to_currency != 'USD':
-            usd_to_target = self._get_exchange_rate('USD', to_currency, exchange_rates)
-            source_to_usd = self._get_exchange_rate(from_currency, 'USD', exchange_rates)
-            if usd_to_target and source_to_usd:
-                return source_to_usd * usd_to_target
-        
-        return 1.0  # Заглушка если курс не найден
+            Курс обмена или None если курс не найден
+        """
+        return _resolve_rate(_norm(from_currency), _norm(to_currency), _rate_table(exchange_rates))
     
     def has_currency(self, currency_code: str) -> bool:
         """
@@ -536,7 +931,7 @@ class Portfolio:
         Returns:
             True если валюта есть, иначе False
         """
-        return currency_code.upper() in self._wallets
+        return _norm(currency_code) in self._wallets
     
     def remove_currency(self, currency_code: str) -> bool:
         """
@@ -548,7 +943,7 @@ class Portfolio:
         Returns:
             True если удалено, False если не найдено
         """
-        currency_code = currency_code.upper()
+        currency_code = _norm(currency_code)
         if currency_code in self._wallets:
             del self._wallets[currency_code]
             return True
@@ -571,16 +966,48 @@ class Portfolio:
         Returns:
             Словарь для сохранения в JSON
         """
-        wallets_dict = {}
-        for currency_code, wallet in self._wallets.items():
-            wallets_dict[currency_code] = wallet.to_dict()
-        
         return {
             "user_id": self._user_id,
-            "wallets": wallets_dict
+            "wallets": {
+                currency_code: {"currency_code": wallet.currency_code, "balance": wallet.balance}
+                for currency_code, wallet in self._wallets.items()
+            }
         }
 
 
+    @staticmethod
+    def export_batch(portfolios: List['Portfolio'],
+                     currency_order: List[str]) -> Tuple[array, List[int]]:
+        """
+        Выгрузка балансов многих портфелей в одну плоскую матрицу float64.
+        
+        Матрица хранится построчно: строка i - портфель user_ids[i],
+        столбец j - валюта currency_order[j]; отсутствующие кошельки дают 0.0.
+        balances.tobytes() даёт компактный бинарный снимок, а метаданные
+        (currency_order и user_ids) хранятся отдельно, например в JSON.
+        Для ответа по одному пользователю по-прежнему используется to_dict.
+        
+        Args:
+            portfolios: Список портфелей
+            currency_order: Порядок валют (столбцы матрицы)
+            
+        Returns:
+            Кортеж (матрица балансов array('d'), список user_id по строкам)
+        """
+        codes = [_norm(code) for code in currency_order]
+        balances = array('d')
+        user_ids = []
+        
+        for portfolio in portfolios:
+            wallets = portfolio._wallets
+            balances.extend(
+                wallets[code].balance if code in wallets else 0.0
+                for code in codes
+            )
+            user_ids.append(portfolio._user_id)
+        
+        return balances, user_ids
+    
     @classmethod
     def from_dict(cls, data: dict) -> 'Portfolio':
         """
@@ -592,14 +1019,29 @@ class Portfolio:
         Returns:
             Объект Portfolio
         """
-        wallets = {}
-        for currency_code, wallet_data in data["wallets"].items():
-            wallets[currency_code] = Wallet.from_dict(wallet_data)
+        wallets = {
+            currency_code: Wallet._unchecked(wallet_data["currency_code"], float(wallet_data["balance"]))
+            for currency_code, wallet_data in data["wallets"].items()
+        }
+        return cls._unchecked(data["user_id"], wallets)
+    
+    @classmethod
+    def _unchecked(cls, user_id: int, wallets: Dict[str, 'Wallet']) -> 'Portfolio':
+        """
+        Создание портфеля без валидации (для доверенных данных).
         
-        return cls(
-            user_id=data["user_id"],
-            wallets=wallets
-        )
+        Args:
+            user_id: Уникальный идентификатор пользователя
+            wallets: Словарь кошельков (ключ - код валюты, значение - Wallet)
+            
+        Returns:
+            Объект Portfolio
+        """
+        portfolio = cls.__new__(cls)
+        portfolio._user_id = user_id
+        portfolio._wallets = wallets
+        portfolio._wallets_view = MappingProxyType(wallets)
+        return portfolio
     
     def __str__(self) -> str:
         """Строковое представление портфеля."""
@@ -616,4 +1058,39 @@ class Portfolio:
     
     def __contains__(self, currency_code: str) -> bool:
         """Проверка наличия валюты в портфеле."""
-        return currency_code.upper() in self._wallets
\ No newline at end of file
+        return _norm(currency_code) in self._wallets
+
+
+def value_all_portfolios(portfolios: List[Portfolio], exchange_rates: Dict[Tuple[str, str], float],
+                         base_currency: str = 'USD') -> Dict[int, float]:
+    """
+    Пакетная оценка стоимости нескольких портфелей.
+    
+    Курс каждой валюты ищется один раз на весь пакет, а не заново
+    для каждого портфеля. Валюты без курса пропускаются. Курсы читаются
+    из exchange_rates при каждом вызове.
+    
+    Args:
+        portfolios: Список портфелей
+        exchange_rates: Словарь курсов валют
+        base_currency: Базовая валюта для конвертации
+        
+    Returns:
+        Словарь {user_id: общая стоимость в базовой валюте}
+    """
+    rate_table = _rate_table(exchange_rates)
+    resolved: Dict[str, Optional[float]] = {}
+    totals = {}
+    
+    for portfolio in portfolios:
+        total_value = 0.0
+        for currency_code, wallet in portfolio.wallets.items():
+            try:
+                rate = resolved[currency_code]
+            except KeyError:
+                rate = resolved[currency_code] = _resolve_rate(currency_code, base_currency, rate_table)
+            if rate is not None:
+                total_value += wallet.balance * rate
+        totals[portfolio.user_id] = total_value
+    
+    return totals
@@ -1,133 +1,302 @@
-import functools
+import atexit
 import inspect
 import logging
-
-# Создаем директорию для логов
+import logging.handlers
 import os
-from datetime import datetime
-from typing import Any, Callable
-
-os.makedirs('logs', exist_ok=True)
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(levelname)s %(asctime)s %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S',
-    handlers=[
-        logging.FileHandler('logs/actions.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+import queue
+import time
+from typing import Callable
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Форматтер, кэширующий строку времени записи в пределах одной секунды.
+    
+    При формате даты с точностью до секунды строка меняется не чаще раза
+    в секунду, поэтому localtime() и strftime() вызываются только при
+    смене секунды, а не для каждой записи.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_time = (None, '')
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        if datefmt is None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached_text = self._cached_time
+        if second != cached_second:
+            cached_text = time.strftime(datefmt, self.converter(second))
+            self._cached_time = (second, cached_text)
+        return cached_text
+
+
+# Формат записей в файле и консоли
+_formatter = CachedTimeFormatter(
+    fmt='%(levelname)s %(asctime)s %(message)s',
+    datefmt='%Y-%m-%dT%H:%M:%S'
 )
 
-logger = logging.getLogger(__name__)
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    Файловый обработчик с блочной буферизацией.
+    
+    Записи копятся в буфере файла и сбрасываются на диск при его
+    заполнении, а записи уровня ERROR и выше - сразу.
+    """
+    
+    BUFFER_SIZE = 64 * 1024
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.BUFFER_SIZE,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
 
 
-def log_action(action_name: str = None, verbose: bool = False):
+# Запись в файл и консоль выполняется в фоновом потоке QueueListener,
+# вызывающий поток только кладёт запись в очередь
+_log_queue = queue.SimpleQueue()
+_output_handlers = []
+_listener = None
+
+# Логирование настраивается один раз явным вызовом configure_logging()
+# из точки входа приложения, а не при импорте или декорировании; до этого
+# записи операций никуда не выводятся
+_configured = False
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def configure_logging() -> None:
+    """
+    Настройка логирования приложения (повторные вызовы ничего не делают).
+    
+    Создаёт директорию для логов, запускает фоновый QueueListener
+    с файловым обработчиком (и консольным, если задана переменная
+    окружения VT_LOG_CONSOLE) и подключает QueueHandler к логгеру модуля.
+    Корневой логгер не меняется: записи операций в него не передаются.
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+    
+    # Создаем директорию для логов
+    os.makedirs('logs', exist_ok=True)
+    
+    # Файл открывается при первой записи; дублирование в консоль (stderr)
+    # включается только переменной окружения VT_LOG_CONSOLE
+    _output_handlers.append(BufferedFileHandler('logs/actions.log', encoding='utf-8', delay=True))
+    if os.environ.get('VT_LOG_CONSOLE'):
+        _output_handlers.append(logging.StreamHandler())
+    for handler in _output_handlers:
+        handler.setFormatter(_formatter)
+    
+    _listener = logging.handlers.QueueListener(_log_queue, *_output_handlers)
+    _listener.start()
+    atexit.register(_shutdown_logging)
+    
+    # QueueHandler передаёт в очередь только текст сообщения,
+    # итоговый формат применяют обработчики слушателя
+    queue_handler = logging.handlers.QueueHandler(_log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+
+def _shutdown_logging() -> None:
+    """Дописывает очередь и сбрасывает буфер файла при выходе."""
+    _listener.stop()
+    for handler in _output_handlers:
+        handler.flush()
+
+
+# Поля лога и имена параметров функции, из которых они берутся (по приоритету)
+_LOGGED_PARAMS = (
+    ('user', ('user_id', 'username')),
+    ('currency', ('currency_code', 'currency')),
+    ('amount', ('amount',)),
+    ('from', ('from_currency',)),
+    ('to', ('to_currency',)),
+)
+
+# Параметры с числовыми значениями: в логе пишутся без кавычек
+_NUMERIC_PARAMS = frozenset({'user_id', 'amount'})
+
+# Слоты для данных из результата функции: (поле, число ли). Бит i маски
+# заполненных слотов соответствует _RESULT_SLOTS[i]
+_RESULT_SLOTS = (('rate', True), ('base', False))
+
+# Форматы числовых полей лога (уже отформатированная строка пишется как есть)
+_VALUE_FORMATS = {'amount': '.4f', 'rate': '.2f'}
+
+# Шаблоны полей лога для закрытого набора ключей: (поле, число ли) -> шаблон;
+# подстановку значения выполняет %-форматирование
+_LOG_KEYS = (
+    tuple(key for key, _ in _LOGGED_PARAMS)
+    + tuple(key for key, _ in _RESULT_SLOTS)
+    + ('error_type', 'error_message')
+)
+_KEY_TEMPLATES = {
+    (key, is_numeric): f" {key}=%s" if is_numeric else f" {key}='%s'"
+    for key in _LOG_KEYS
+    for is_numeric in (False, True)
+}
+
+
+# Маркер параметра, не переданного при вызове и не имеющего значения по умолчанию
+_MISSING = object()
+
+
+def _args_template(fields: list) -> str:
+    """
+    Сборка части шаблона строки лога с аргументами операции.
+    
+    Args:
+        fields: Пары (поле лога, имя параметра)
+        
+    Returns:
+        Склеенные шаблоны полей из _KEY_TEMPLATES
+    """
+    return ''.join([_KEY_TEMPLATES[key, name in _NUMERIC_PARAMS] for key, name in fields])
+
+
+def log_action(action_name: str = None):
     """
     Декоратор для логирования операций.
     
     Args:
         action_name: Название операции (BUY/SELL/REGISTER/LOGIN)
-        verbose: Подробное логирование
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            # Определяем имя операции
-            operation = action_name or func.__name__.upper()
-            
-            # Базовые данные для лога
-            log_data = {
-                'timestamp': datetime.now().isoformat(),
-                'action': operation,
-                'result': 'OK'
-            }
-            
+        # Логгер и его методы берутся один раз на функцию, а не на каждый вызов
+        logger = logging.getLogger(__name__)
+        enabled = logger.isEnabledFor
+        info = logger.info
+        error = logger.error
+        
+        # Сигнатура и набор логируемых параметров вычисляются один раз
+        sig = inspect.signature(func)
+        positions = {}
+        for position, param in enumerate(sig.parameters.values()):
+            if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+                positions[param.name] = position
+        fields = []
+        specs = []
+        for key, names in _LOGGED_PARAMS:
+            for name in names:
+                param = sig.parameters.get(name)
+                if param is not None and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                    fields.append((key, name))
+                    # (позиция, имя для поиска в kwargs, значение по умолчанию);
+                    # позиционно-только параметр по имени не ищется
+                    specs.append((
+                        positions.get(name),
+                        None if param.kind is param.POSITIONAL_ONLY else name,
+                        _MISSING if param.default is param.empty else param.default,
+                    ))
+                    break
+        formatted = [
+            (index, _VALUE_FORMATS[key])
+            for index, (key, _) in enumerate(fields) if key in _VALUE_FORMATS
+        ]
+        slots = [
+            (key, 1 << slot, _VALUE_FORMATS.get(key))
+            for slot, (key, _) in enumerate(_RESULT_SLOTS)
+        ]
+        
+        # Шаблоны строк лога собираются один раз: на успех - по одному на
+        # каждую маску заполненных слотов результата, на ошибку - один;
+        # время записи проставляет сам logging (%(asctime)s в формате)
+        operation = (action_name or func.__name__.upper()).replace('%', '%%')
+        args_template = _args_template(fields)
+        success_templates = [
+            operation + " result='OK'" + args_template + ''.join([
+                _KEY_TEMPLATES[_RESULT_SLOTS[slot]]
+                for slot in range(len(_RESULT_SLOTS)) if mask >> slot & 1
+            ])
+            for mask in range(1 << len(_RESULT_SLOTS))
+        ]
+        error_suffix = _KEY_TEMPLATES['error_type', False] + _KEY_TEMPLATES['error_message', False]
+        error_template = operation + " result='ERROR'" + args_template + error_suffix
+        
+        def wrapper(*args, **kwargs):
+            count = len(args)
+            values = [
+                args[position] if position is not None and position < count
+                else kwargs.get(name, default)
+                for position, name, default in specs
+            ]
             try:
-                # Извлекаем параметры из аргументов функции
-                sig = inspect.signature(func)
-                bound_args = sig.bind(*args, **kwargs)
-                bound_args.apply_defaults()
-                
-                # Добавляем основные параметры в лог
-                params = bound_args.arguments
-                
-                if 'user_id' in params:
-                    log_data['user'] = params['user_id']
-                elif 'username' in params:
-                    log_data['user'] = params['username']
+                # Числовые аргументы форматируются внутри try, чтобы ошибка
+                # форматирования попала в лог как ошибка операции
+                for index, spec in formatted:
+                    value = values[index]
+                    if type(value) is not str and value is not _MISSING:
+                        values[index] = format(value, spec)
                 
-                if 'currency_code' in params:
-                    log_data['currency'] = params['currency_code']
-                elif 'currency' in params:
-                    log_data['currency'] = params['currency']
-                
-                if 'amount' in params:
-                    log_data['amount'] = f"{params['amount']:.4f}"
-                
-                if 'from_currency' in params:
-                    log_data['from'] = params['from_currency']
-                if 'to_currency' in params:
-                    log_data['to'] = params['to_currency']
-                
-                # Выполняем функцию
                 result = func(*args, **kwargs)
                 
-                # Если функция возвращает словарь с дополнительными данными, добавляем их
-                if isinstance(result, dict):
-                    if 'rate' in result:
-                        log_data['rate'] = f"{result['rate']:.2f}"
-                    if 'base' in result:
-                        log_data['base'] = result['base']
-                
-                # Логируем успех
-                logger.info(f"{operation} {_format_log_data(log_data)}")
+                if enabled(logging.INFO):
+                    mask = 0
+                    extra = []
+                    if isinstance(result, dict):
+                        for key, bit, spec in slots:
+                            if key in result:
+                                value = result[key]
+                                if spec is not None and type(value) is not str:
+                                    value = format(value, spec)
+                                extra.append(value)
+                                mask |= bit
+                    info(success_templates[mask], *values, *extra)
                 return result
-                
             except Exception as e:
-                # Логируем ошибку
-                log_data.update({
-                    'result': 'ERROR',
-                    'error_type': type(e).__name__,
-                    'error_message': str(e)
-                })
-                logger.error(f"{operation} {_format_log_data(log_data)}")
-                raise  # Пробрасываем исключение дальше
-                
+                if enabled(logging.ERROR):
+                    template = error_template
+                    if any(value is _MISSING for value in values):
+                        # Вызов без обязательного аргумента: в лог идут только
+                        # переданные аргументы
+                        present = [
+                            index for index, value in enumerate(values)
+                            if value is not _MISSING
+                        ]
+                        template = (
+                            operation + " result='ERROR'"
+                            + _args_template([fields[index] for index in present])
+                            + error_suffix
+                        )
+                        values = [values[index] for index in present]
+                    error(template, *values, type(e).__name__, str(e))
+                raise
+        
+        # Копируем только нужные метаданные: без __wrapped__ inspect.signature
+        # не разворачивает цепочку обёрток (сигнатура уже разобрана выше)
+        wrapper.__module__ = func.__module__
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = func.__qualname__
+        wrapper.__doc__ = func.__doc__
         return wrapper
     return decorator
 
 
-def _format_log_data(data: dict) -> str:
-    """Форматирование данных лога в строку."""
-    parts = []
-    for key, value in data.items():
-        if key != 'action':
-            # Для числовых значений не ставим кавычки
-            if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '').isdigit()):
-                parts.append(f"{key}={value}")
-            else:
-                parts.append(f"{key}='{value}'")
-    return ' '.join(parts)
-
-
-# Специализированные декораторы для конкретных операций
-def log_buy(func: Callable) -> Callable:
-    return log_action('BUY', verbose=True)(func)
-
-
-def log_sell(func: Callable) -> Callable:
-    return log_action('SELL', verbose=True)(func)
-
-
-def log_register(func: Callable) -> Callable:
-    return log_action('REGISTER')(func)
-
-
-def log_login(func: Callable) -> Callable:
-    return log_action('LOGIN')(func)
-
-
-def log_get_rate(func: Callable) -> Callable:
-    return log_action('GET_RATE')(func)
\ No newline at end of file
+# Специализированные декораторы для конкретных операций: настроенный
+# декоратор создаётся один раз и переиспользуется для каждой функции
+log_buy = log_action('BUY')
+log_sell = log_action('SELL')
+log_register = log_action('REGISTER')
+log_login = log_action('LOGIN')
+log_get_rate = log_action('GET_RATE')